@@ -1,12 +1,17 @@
+import asyncio
+import hashlib
+import json
 import os
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 try:
-    from openai import OpenAI
-    from openai.error import OpenAIError
+    import httpx
+    from openai import AsyncOpenAI, OpenAIError
 except ImportError:  # pragma: no cover - optional dependency during tests
-    OpenAI = None
+    httpx = None
+    AsyncOpenAI = None
     OpenAIError = Exception  # type: ignore
 
 
@@ -93,14 +98,36 @@ AGENT_DEFINITIONS: Dict[str, AgentDefinition] = {
 
 SUPPORT_SEQUENCE: List[str] = ["navigator", "intel", "engineer", "operations", "captain"]
 
+# Roles that synthesise earlier inputs and therefore must run after the fan-out.
+DEPENDENT_ROLES: List[str] = ["captain"]
+
+_COMPASS_POINTS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+
+# Prompt headers are invariant per role, so they are assembled once at import time.
+_SITUATION_DIVIDER = "\n\n---\nCurrent situation:"
+_DEFAULT_PROMPT_HEADER = (
+    "Summarise the situation in two bullet points and close with a directive sentence"
+    " that references the present heading."
+    + _SITUATION_DIVIDER
+)
+_TARGET_PROMPT_HEADER = (
+    "Speak as {name} ({role}). "
+    "Provide two crisp bullets describing your reasoning and finish with a directive"
+    " sentence for the crew that cites the heading to steer."
+    + _SITUATION_DIVIDER
+)
+_PROMPT_HEADERS: Dict[str, str] = {
+    role: definition.prompt_template + _SITUATION_DIVIDER
+    for role, definition in AGENT_DEFINITIONS.items()
+}
+
 
 def format_heading(heading: Optional[float]) -> str:
     if heading is None:
         return "steady course"
-    wrapped = (heading % 360 + 360) % 360
-    headings = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
-    label = headings[int(round(wrapped / 45)) % len(headings)]
-    return f"{wrapped:.0f}° {label}"
+    # Python's modulo already yields a non-negative result for a positive divisor.
+    wrapped = heading % 360.0
+    return f"{wrapped:.0f}° {_COMPASS_POINTS[round(wrapped / 45) & 7]}"
 
 
 def format_drift(drift: Optional[float]) -> str:
@@ -120,40 +147,111 @@ def format_efficiency(efficiency: Optional[float]) -> str:
 
 
 class AgentOrchestrator:
-    def __init__(self, default_model: str = "gpt-4.1-mini") -> None:
+    def __init__(
+        self,
+        default_model: str = "gpt-4.1-mini",
+        max_concurrency: int = 4,
+        assistant_cache_path: Optional[str] = None,
+        response_cache_size: int = 512,
+        api_mode: Optional[str] = None,
+    ) -> None:
         self.default_model = default_model
-        self._client: Optional[OpenAI] = None
-        self._assistant_cache: Dict[str, str] = {}
+        # "chat" answers each role with one Chat Completions call; "assistants" keeps the
+        # legacy Assistants + Threads flow.
+        self.api_mode = api_mode or os.getenv("AGENT_API_MODE", "chat")
+        self.max_concurrency = max_concurrency
+        self.response_cache_size = response_cache_size
+        self._response_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        # Admission control shared by every request so concurrent clients queue here
+        # instead of piling onto the upstream rate limit.
+        self._global_semaphore = asyncio.Semaphore(int(os.getenv("AGENT_MAX_INFLIGHT", "16")))
+        per_role_limit = int(os.getenv("AGENT_MAX_INFLIGHT_PER_ROLE", "4"))
+        self._role_semaphores: Dict[str, asyncio.Semaphore] = {
+            role: asyncio.Semaphore(per_role_limit) for role in AGENT_DEFINITIONS
+        }
+        self._client: Optional[AsyncOpenAI] = None
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self._assistant_cache_path = assistant_cache_path or os.getenv(
+            "AGENT_ASSISTANT_CACHE", ".assistants.json"
+        )
+        self._assistant_cache: Dict[str, str] = self._load_assistant_cache()
 
     def is_available(self) -> bool:
-        return OpenAI is not None and bool(os.getenv("OPENAI_API_KEY"))
+        return AsyncOpenAI is not None and bool(os.getenv("OPENAI_API_KEY"))
 
-    def _ensure_client(self) -> OpenAI:
+    def _ensure_client(self) -> AsyncOpenAI:
         if self._client is None:
-            if OpenAI is None:
+            if AsyncOpenAI is None:
                 raise RuntimeError("OpenAI SDK not available")
-            self._client = OpenAI()
+            # One pooled HTTP/2 client lets concurrent agent calls share a connection.
+            self._http_client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                timeout=httpx.Timeout(30.0, connect=5.0),
+            )
+            self._client = AsyncOpenAI(http_client=self._http_client)
         return self._client
 
-    def _ensure_assistant(self, role: str) -> str:
-        if role in self._assistant_cache:
-            return self._assistant_cache[role]
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._http_client = None
+
+    def _load_assistant_cache(self) -> Dict[str, str]:
+        try:
+            with open(self._assistant_cache_path, encoding="utf-8") as handle:
+                cached = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        return cached if isinstance(cached, dict) else {}
+
+    def _save_assistant_cache(self) -> None:
+        try:
+            with open(self._assistant_cache_path, "w", encoding="utf-8") as handle:
+                json.dump(self._assistant_cache, handle, indent=2, sort_keys=True)
+        except OSError:  # pragma: no cover - read-only deployments keep the in-memory cache
+            pass
+
+    def _assistant_key(self, definition: AgentDefinition) -> str:
+        model = definition.model or self.default_model
+        fingerprint = f"{model}|{definition.name}|{definition.instructions}|{definition.temperature}"
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    async def _ensure_assistant(self, role: str) -> str:
         definition = AGENT_DEFINITIONS[role]
+        key = self._assistant_key(definition)
+        if key in self._assistant_cache:
+            return self._assistant_cache[key]
         client = self._ensure_client()
-        assistant = client.beta.assistants.create(
+        assistant = await client.beta.assistants.create(
             model=definition.model or self.default_model,
             name=definition.name,
             instructions=definition.instructions,
             temperature=definition.temperature,
         )
-        self._assistant_cache[role] = assistant.id
+        self._assistant_cache[key] = assistant.id
+        self._save_assistant_cache()
         return assistant.id
 
+    async def prewarm(self) -> None:
+        """Resolve every assistant up front so the first request skips creation calls."""
+        if not self.is_available() or self.api_mode != "assistants":
+            return
+        await asyncio.gather(*(self._ensure_assistant(role) for role in SUPPORT_SEQUENCE))
+
     def _build_sequence(self, target_role: str) -> List[str]:
         sequence = [role for role in SUPPORT_SEQUENCE if role != target_role]
         sequence.append(target_role)
         return sequence
 
+    def _split_sequence(self, target_role: str) -> Tuple[List[str], List[str]]:
+        """Split the sequence into independent roles and roles that need prior inputs."""
+        sequence = self._build_sequence(target_role)
+        parallel = [role for role in sequence[:-1] if role not in DEPENDENT_ROLES]
+        ordered = [role for role in sequence if role not in parallel]
+        return parallel, ordered
+
     def _compose_prompt(
         self,
         role: str,
@@ -173,73 +271,143 @@ class AgentOrchestrator:
         if telemetry.get("fuel_label"):
             summary_lines.append(f"Fuel reserves {telemetry['fuel_label']}")
         if metrics:
-            detail = ", ".join(filter(None, [
-                format_efficiency(metrics.get("efficiency")),
-                f"Stress {metrics['stress']:.0f}%" if isinstance(metrics.get("stress"), (int, float)) else "",
-                f"Fatigue {metrics['fatigue']:.0f}%" if isinstance(metrics.get("fatigue"), (int, float)) else "",
-            ]))
-            if detail:
-                summary_lines.append(detail)
+            details: List[str] = []
+            efficiency = format_efficiency(metrics.get("efficiency"))
+            if efficiency:
+                details.append(efficiency)
+            stress = metrics.get("stress")
+            if isinstance(stress, (int, float)):
+                details.append(f"Stress {stress:.0f}%")
+            fatigue = metrics.get("fatigue")
+            if isinstance(fatigue, (int, float)):
+                details.append(f"Fatigue {fatigue:.0f}%")
+            if details:
+                summary_lines.append(", ".join(details))
 
-        if prior_responses:
-            thread = "\n".join(
-                f"{entry['role'].title()}: {entry['content']}" for entry in prior_responses
-            )
-            conversation = f"\nPrior inputs:\n{thread}\n"
+        if role == context["target_role"]:
+            crew = context["crew"]
+            header = _TARGET_PROMPT_HEADER.format(name=crew["name"], role=crew["role"])
         else:
-            conversation = "\nNo prior agent inputs.\n"
+            header = _PROMPT_HEADERS.get(role, _DEFAULT_PROMPT_HEADER)
 
-        if role in AGENT_DEFINITIONS:
-            template = AGENT_DEFINITIONS[role].prompt_template
+        # Static guidance leads so provider-side prompt caching can reuse the prefix;
+        # per-tick telemetry and prior inputs trail it.
+        parts = [header, *summary_lines, ""]
+        if prior_responses:
+            parts.append("Prior inputs:")
+            parts.extend(f"{entry['role'].title()}: {entry['content']}" for entry in prior_responses)
         else:
-            template = (
-                "Summarise the situation in two bullet points and close with a directive sentence"
-                " that references the present heading."
-            )
+            parts.append("No prior agent inputs.")
+        return "\n".join(parts)
 
-        if role == context["target_role"]:
-            template = (
-                f"Speak as {context['crew']['name']} ({context['crew']['role']}). "
-                "Provide two crisp bullets describing your reasoning and finish with a directive"
-                " sentence for the crew that cites the heading to steer."
-            )
+    async def _run_role(
+        self,
+        role: str,
+        context: Dict[str, object],
+        prior_responses: List[Dict[str, str]],
+    ) -> Dict[str, str]:
+        prompt = self._compose_prompt(role, context, prior_responses)
+        cache_key = (role, hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest())
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            self._response_cache.move_to_end(cache_key)
+            return {"role": role, "content": cached}
 
-        summary = "\n".join(summary_lines)
-        return f"{summary}\n{conversation}\n{template}"
+        # Take the per-role permit first so a global slot is only held by a call that can run.
+        async with self._role_semaphores[role], self._global_semaphore:
+            if self.api_mode == "assistants":
+                response_text = await self._complete_with_assistant(role, prompt)
+            else:
+                response_text = await self._complete_with_chat(role, prompt)
+        response_text = response_text.strip() or "No directive provided."
+        self._remember_response(cache_key, response_text)
+        return {"role": role, "content": response_text}
 
-    def run(self, context: Dict[str, object]) -> List[Dict[str, str]]:
-        if not self.is_available():
-            raise RuntimeError("OpenAI Agents SDK is not available")
+    async def _complete_with_chat(self, role: str, prompt: str) -> str:
+        definition = AGENT_DEFINITIONS[role]
+        client = self._ensure_client()
+        options: Dict[str, object] = {}
+        if definition.temperature is not None:
+            options["temperature"] = definition.temperature
+        completion = await client.chat.completions.create(
+            model=definition.model or self.default_model,
+            messages=[
+                {"role": "system", "content": definition.instructions},
+                {"role": "user", "content": prompt},
+            ],
+            **options,
+        )
+        return completion.choices[0].message.content or ""
 
+    async def _complete_with_assistant(self, role: str, prompt: str) -> str:
         client = self._ensure_client()
+        assistant_id = await self._ensure_assistant(role)
+        # Each role gets its own thread so concurrent runs never interleave messages.
+        thread = await client.beta.threads.create()
+        await client.beta.threads.messages.create(thread_id=thread.id, role="user", content=prompt)
+        run = await client.beta.threads.runs.create_and_poll(thread_id=thread.id, assistant_id=assistant_id)
+        if run.status != "completed":
+            raise RuntimeError(f"Agent '{role}' did not complete (status={run.status}).")
+
+        messages = await client.beta.threads.messages.list(thread_id=thread.id, order="desc", limit=5)
+        response_text = ""
+        for message in messages.data:
+            if message.run_id != run.id:
+                continue
+            for block in message.content:
+                if getattr(block, "type", None) == "text":  # type: ignore[attr-defined]
+                    response_text += block.text.value.strip() + "\n"
+        return response_text
+
+    def _remember_response(self, key: Tuple[str, str], text: str) -> None:
+        self._response_cache[key] = text
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+
+    async def run(self, context: Dict[str, object]) -> List[Dict[str, str]]:
         sequence = self._build_sequence(context["target_role"])
-        thread = client.beta.threads.create()
-        conversation: List[Dict[str, str]] = []
+        conversation = [entry async for entry in self.run_iter(context)]
+        conversation.sort(key=lambda entry: sequence.index(entry["role"]))
+        return conversation
+
+    async def run_iter(self, context: Dict[str, object]) -> AsyncIterator[Dict[str, str]]:
+        """Yield each agent's response as soon as it completes.
+
+        Support roles arrive in completion order; dependent roles and the target
+        role follow in sequence order.
+        """
+        if not self.is_available():
+            raise RuntimeError("OpenAI Agents SDK is not available")
+
+        parallel, ordered = self._split_sequence(context["target_role"])
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_support(role: str) -> Dict[str, str]:
+            async with semaphore:
+                return await self._run_role(role, context, [])
 
         try:
-            for role in sequence:
-                assistant_id = self._ensure_assistant(role)
-                prompt = self._compose_prompt(role, context, conversation)
-                client.beta.threads.messages.create(thread_id=thread.id, role="user", content=prompt)
-                run = client.beta.threads.runs.create_and_poll(thread_id=thread.id, assistant_id=assistant_id)
-                if run.status != "completed":
-                    raise RuntimeError(f"Agent '{role}' did not complete (status={run.status}).")
-
-                messages = client.beta.threads.messages.list(thread_id=thread.id, order="desc", limit=5)
-                response_text = ""
-                for message in messages.data:
-                    if message.run_id != run.id:
-                        continue
-                    for block in message.content:
-                        if getattr(block, "type", None) == "text":  # type: ignore[attr-defined]
-                            response_text += block.text.value.strip() + "\n"
-                response_text = response_text.strip() or "No directive provided."
-                conversation.append({"role": role, "content": response_text})
+            tasks = [asyncio.ensure_future(run_support(role)) for role in parallel]
+            completed: Dict[str, Dict[str, str]] = {}
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    entry = await next_done
+                    completed[entry["role"]] = entry
+                    yield entry
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            # Keep prior inputs in sequence order so dependent prompts stay cacheable.
+            conversation = [completed[role] for role in parallel]
+            for role in ordered:
+                entry = await self._run_role(role, context, conversation)
+                conversation.append(entry)
+                yield entry
         except OpenAIError as exc:  # pragma: no cover - network failure path
             raise RuntimeError("Agents SDK call failed") from exc
 
-        return conversation
-
 
 def synthesise_fallback(context: Dict[str, object]) -> Dict[str, object]:
     telemetry = context["telemetry"]
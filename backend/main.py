@@ -1,14 +1,17 @@
-import io
+import asyncio
 import json
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from threading import Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from uuid import uuid4
 
+import orjson
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import AliasChoices, BaseModel, Field, ConfigDict
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import AliasChoices, BaseModel, Field, ConfigDict, TypeAdapter
 
 from .agents import AgentOrchestrator, format_drift, format_heading, synthesise_fallback
 
@@ -18,6 +21,8 @@ def clamp(value: float, minimum: float, maximum: float) -> float:
 
 
 class CrewMemberPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     role: str
@@ -26,18 +31,24 @@ class CrewMemberPayload(BaseModel):
 
 
 class MilestonePayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     label: str
     description: str
 
 
 class RoutePayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     cable: str
 
 
 class TelemetryPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     progress: float = 0.0
     heading_deg: Optional[float] = None
     drift: Optional[float] = None
@@ -46,12 +57,16 @@ class TelemetryPayload(BaseModel):
 
 
 class CrewMetricsPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     stress: Optional[float] = None
     fatigue: Optional[float] = None
     efficiency: Optional[float] = None
 
 
 class CrewThoughtRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     crew_member: CrewMemberPayload
     milestone: MilestonePayload
     route: RoutePayload
@@ -104,7 +119,21 @@ class ShipLogEntryResponse(BaseModel):
     conversation: List[Dict[str, str]] = Field(default_factory=list)
 
 
-app = FastAPI(title="Submarine Agents Backend")
+class ShipJSONResponse(ORJSONResponse):
+    """orjson-backed response that falls back to stdlib json for content orjson rejects.
+
+    Log metadata is client-supplied and may hold integers beyond 64 bits, which orjson
+    refuses to encode.
+    """
+
+    def render(self, content: Any) -> bytes:
+        try:
+            return super().render(content)
+        except orjson.JSONEncodeError:
+            return JSONResponse.render(self, content)
+
+
+app = FastAPI(title="Submarine Agents Backend", default_response_class=ShipJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -114,19 +143,45 @@ app.add_middleware(
 
 orchestrator = AgentOrchestrator()
 
-_ship_log_entries: List[ShipLogEntryResponse] = []
-_ship_log_lock = Lock()
+
+@app.on_event("startup")
+async def prewarm_orchestrator() -> None:
+    try:
+        await orchestrator.prewarm()
+    except Exception:  # pragma: no cover - first request will retry assistant creation
+        pass
+
+
+@app.on_event("shutdown")
+async def close_orchestrator() -> None:
+    await orchestrator.aclose()
+
+
 _MAX_LOG_ENTRIES = 2000
+_ship_log_entries: "deque[ShipLogEntryResponse]" = deque(maxlen=_MAX_LOG_ENTRIES)
+_ship_log_lock = Lock()
+_LOG_LIST_ADAPTER = TypeAdapter(List[ShipLogEntryResponse])
+# (story, entry_count, last_entry_id) for the most recently rendered narrative.
+_story_cache: Optional[Tuple[str, int, Optional[str]]] = None
 
 
 def _serialize_timestamp(value: datetime) -> str:
-    return value.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    # Naive values are treated as UTC; aware values are normalised to UTC.
+    if value.tzinfo is not None:
+        try:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        except (OverflowError, ValueError):
+            # Converting would leave datetime's range; keep the original offset instead.
+            return value.isoformat(timespec="seconds").replace("+00:00", "Z")
+    # isoformat zero-pads the year, which strftime("%Y") does not do on every platform.
+    return value.isoformat(timespec="seconds") + "Z"
 
 
 def _record_ship_log_entry(payload: ShipLogEntryPayload) -> ShipLogEntryResponse:
-    timestamp = payload.timestamp or datetime.utcnow()
+    timestamp = payload.timestamp or datetime.now(timezone.utc)
     entry_id = payload.id or f"log-{uuid4()}"
-    record = ShipLogEntryResponse(
+    # Every field comes from an already validated payload, so skip re-validation.
+    record = ShipLogEntryResponse.model_construct(
         id=entry_id,
         timestamp=_serialize_timestamp(timestamp),
         type=payload.entry_type,
@@ -138,10 +193,10 @@ def _record_ship_log_entry(payload: ShipLogEntryPayload) -> ShipLogEntryResponse
         metadata=payload.metadata or {},
         conversation=list(payload.conversation or []),
     )
+    global _story_cache
     with _ship_log_lock:
         _ship_log_entries.append(record)
-        if len(_ship_log_entries) > _MAX_LOG_ENTRIES:
-            del _ship_log_entries[: len(_ship_log_entries) - _MAX_LOG_ENTRIES]
+        _story_cache = None
     return record
 
 
@@ -151,8 +206,10 @@ def _get_ship_log_entries() -> List[ShipLogEntryResponse]:
 
 
 def _reset_ship_log() -> None:
+    global _story_cache
     with _ship_log_lock:
         _ship_log_entries.clear()
+        _story_cache = None
 
 
 def _parse_timestamp(value: str) -> Optional[datetime]:
@@ -192,9 +249,18 @@ def _build_ship_log_story(entries: List[ShipLogEntryResponse]) -> str:
         duration_label = _format_duration(end_time - start_time)
 
     total_entries = len(entries)
-    system_events = [entry for entry in ordered if entry.type == "system"]
-    reflection_events = [entry for entry in ordered if entry.type == "reflection"]
-    crew_updates = [entry for entry in ordered if entry.type in {"crew", "reflection"}]
+    system_highlights: List[str] = []
+    has_reflections = False
+    final_update: Optional[ShipLogEntryResponse] = None
+    for entry in ordered:
+        if entry.type == "system":
+            if len(system_highlights) < 3:
+                system_highlights.append(entry.transcript.split(".")[0])
+        elif entry.type == "reflection":
+            has_reflections = True
+            final_update = entry
+        elif entry.type == "crew":
+            final_update = entry
 
     paragraphs: List[str] = []
     opening = (
@@ -208,23 +274,20 @@ def _build_ship_log_story(entries: List[ShipLogEntryResponse]) -> str:
         opening += "."
     paragraphs.append(opening)
 
-    if system_events:
-        highlights = ", ".join(
-            event.transcript.split(".")[0] for event in system_events[:3]
-        )
+    if system_highlights:
+        highlights = ", ".join(system_highlights)
         paragraphs.append(
             "Mission waypoints and alerts were marked by the control team: "
             f"{highlights}."
         )
 
-    if reflection_events:
+    if has_reflections:
         paragraphs.append(
             "Crew reflections surfaced on a steady cadence, allowing every department to "
             "voice morale and emotional posture as the voyage advanced."
         )
 
-    if crew_updates:
-        final_update = crew_updates[-1]
+    if final_update is not None:
         closing = final_update.transcript.strip()
         paragraphs.append(
             "The journey closed with "
@@ -234,6 +297,31 @@ def _build_ship_log_story(entries: List[ShipLogEntryResponse]) -> str:
     return "\n\n".join(paragraphs)
 
 
+# Identity metadata is resent unchanged on every telemetry tick, so the dumped dicts are
+# memoised on their field values. The cached dicts are shared; treat them as read-only.
+@lru_cache(maxsize=256)
+def _dump_crew(
+    crew_id: str, name: str, role: str, alliances: Tuple[str, ...], instructions: Optional[str]
+) -> Dict[str, Any]:
+    return {
+        "id": crew_id,
+        "name": name,
+        "role": role,
+        "alliances": list(alliances),
+        "instructions": instructions,
+    }
+
+
+@lru_cache(maxsize=256)
+def _dump_milestone(milestone_id: str, label: str, description: str) -> Dict[str, Any]:
+    return {"id": milestone_id, "label": label, "description": description}
+
+
+@lru_cache(maxsize=256)
+def _dump_route(route_id: str, name: str, cable: str) -> Dict[str, Any]:
+    return {"id": route_id, "name": name, "cable": cable}
+
+
 def _prepare_context(payload: CrewThoughtRequest) -> dict:
     telemetry = payload.telemetry
     progress_percent = clamp(telemetry.progress, 0.0, 1.0) * 100
@@ -243,11 +331,14 @@ def _prepare_context(payload: CrewThoughtRequest) -> dict:
         f"{telemetry.fuel_percentage:.1f}% fuel" if telemetry.fuel_percentage is not None else None
     )
     crew_metrics = payload.crew_metrics.model_dump() if payload.crew_metrics else None
+    crew = payload.crew_member
+    milestone = payload.milestone
+    route = payload.route
 
     return {
-        "crew": payload.crew_member.model_dump(),
-        "milestone": payload.milestone.model_dump(),
-        "route": payload.route.model_dump(),
+        "crew": _dump_crew(crew.id, crew.name, crew.role, tuple(crew.alliances), crew.instructions),
+        "milestone": _dump_milestone(milestone.id, milestone.label, milestone.description),
+        "route": _dump_route(route.id, route.name, route.cable),
         "elapsed_minutes": max(0.0, payload.elapsed_minutes),
         "progress": progress_percent,
         "telemetry": {
@@ -265,16 +356,16 @@ def _build_response_from_conversation(conversation: List[dict]) -> CrewThoughtRe
     if not conversation:
         raise ValueError("Conversation was empty")
     final_entry = conversation[-1]
-    thought_lines: List[str] = []
-    conversation_records: List[Dict[str, str]] = []
-    for entry in conversation:
-        role = entry.get("role", "crew")
-        content = entry.get("content", "")
-        conversation_records.append({"role": role, "content": content})
-        for raw_line in content.splitlines():
-            cleaned = raw_line.strip()
-            if cleaned:
-                thought_lines.append(f"{role.title()}: {cleaned}")
+    conversation_records = [
+        {"role": entry.get("role", "crew"), "content": entry.get("content", "")}
+        for entry in conversation
+    ]
+    thought_lines = [
+        f"{record['role'].title()}: {cleaned}"
+        for record in conversation_records
+        for cleaned in map(str.strip, record["content"].splitlines())
+        if cleaned
+    ]
     return CrewThoughtResponse(
         transcript=final_entry["content"],
         chain_of_thought=thought_lines,
@@ -316,23 +407,61 @@ def _log_crew_thought(
     return response.model_copy(update={"log_entry_id": record.id})
 
 
+def _conversation_crew_thought(
+    context: Dict[str, Any],
+    payload: CrewThoughtRequest,
+    conversation: List[Dict[str, str]],
+) -> CrewThoughtResponse:
+    response = _build_response_from_conversation(conversation)
+    return _log_crew_thought(context, payload, response)
+
+
+def _fallback_crew_thought(context: Dict[str, Any], payload: CrewThoughtRequest) -> CrewThoughtResponse:
+    fallback = synthesise_fallback(context)
+    response = CrewThoughtResponse(**fallback)
+    return _log_crew_thought(context, payload, response)
+
+
 @app.post("/api/crew/thought", response_model=CrewThoughtResponse)
 async def create_crew_thought(payload: CrewThoughtRequest) -> CrewThoughtResponse:
     context = _prepare_context(payload)
+    # Response assembly and logging take the ship log lock, so they run in a worker
+    # thread rather than stalling the event loop.
     if orchestrator.is_available():
         try:
-            conversation = orchestrator.run(context)
-            response = _build_response_from_conversation(conversation)
-            return _log_crew_thought(context, payload, response)
+            conversation = await orchestrator.run(context)
+            return await asyncio.to_thread(_conversation_crew_thought, context, payload, conversation)
         except HTTPException:
             raise
         except Exception:  # pragma: no cover - defensive logging
-            fallback = synthesise_fallback(context)
-            response = CrewThoughtResponse(**fallback)
-            return _log_crew_thought(context, payload, response)
-    fallback = synthesise_fallback(context)
-    response = CrewThoughtResponse(**fallback)
-    return _log_crew_thought(context, payload, response)
+            return await asyncio.to_thread(_fallback_crew_thought, context, payload)
+    return await asyncio.to_thread(_fallback_crew_thought, context, payload)
+
+
+@app.post("/api/crew/thought/stream")
+async def stream_crew_thought(payload: CrewThoughtRequest) -> StreamingResponse:
+    """Stream each officer's response as NDJSON, ending with the logged crew thought."""
+    context = _prepare_context(payload)
+
+    async def generate() -> AsyncIterator[bytes]:
+        response: Optional[CrewThoughtResponse] = None
+        if orchestrator.is_available():
+            conversation: List[Dict[str, str]] = []
+            try:
+                async for entry in orchestrator.run_iter(context):
+                    conversation.append(entry)
+                    yield orjson.dumps({"type": "agent", **entry}) + b"\n"
+                response = await asyncio.to_thread(
+                    _conversation_crew_thought, context, payload, conversation
+                )
+            except Exception:  # pragma: no cover - defensive logging
+                response = None
+        if response is None:
+            response = await asyncio.to_thread(_fallback_crew_thought, context, payload)
+        result = {"type": "result", **response.model_dump()}
+        yield orjson.dumps(result) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 
 @app.post("/api/log", response_model=ShipLogEntryResponse)
@@ -341,34 +470,54 @@ def append_ship_log(entry: ShipLogEntryPayload) -> ShipLogEntryResponse:
 
 
 @app.get("/api/log", response_model=List[ShipLogEntryResponse])
-def list_ship_log() -> List[ShipLogEntryResponse]:
-    return _get_ship_log_entries()
+def list_ship_log() -> Response:
+    # Serialise the whole list in one pass instead of FastAPI's per-item conversion.
+    data = _LOG_LIST_ADAPTER.dump_json(_get_ship_log_entries())
+    return Response(content=data, media_type="application/json")
 
 
 @app.delete("/api/log")
-def clear_ship_log() -> JSONResponse:
+def clear_ship_log() -> ShipJSONResponse:
     _reset_ship_log()
-    return JSONResponse({"status": "cleared"})
+    return ShipJSONResponse({"status": "cleared"})
 
 
-@app.get("/api/log/download")
-def download_ship_log() -> StreamingResponse:
+def _export_ship_log() -> bytes:
     entries = _get_ship_log_entries()
     payload = {
-        "exported_at": _serialize_timestamp(datetime.utcnow()),
+        "exported_at": _serialize_timestamp(datetime.now(timezone.utc)),
         "entry_count": len(entries),
         "entries": [entry.model_dump() for entry in entries],
     }
-    data = json.dumps(payload, ensure_ascii=False, indent=2)
-    buffer = io.BytesIO(data.encode("utf-8"))
-    buffer.seek(0)
-    filename = f"ship-log-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}" + ".json"
+    try:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2)
+    except orjson.JSONEncodeError:
+        # One entry with out-of-range metadata must not break the whole export.
+        return json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+@app.get("/api/log/download")
+async def download_ship_log() -> Response:
+    # Snapshotting and dumping a full log is CPU-bound; keep it off the event loop.
+    data = await asyncio.to_thread(_export_ship_log)
+    filename = f"ship-log-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}" + ".json"
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return StreamingResponse(buffer, media_type="application/json", headers=headers)
+    return Response(content=data, media_type="application/json", headers=headers)
 
 
 @app.get("/api/log/story")
 def ship_log_story() -> Dict[str, Any]:
+    global _story_cache
+    with _ship_log_lock:
+        entry_count = len(_ship_log_entries)
+        last_id = _ship_log_entries[-1].id if entry_count else None
+        cached = _story_cache
+    if cached is not None and cached[1:] == (entry_count, last_id):
+        return {"story": cached[0], "entry_count": entry_count}
+
     entries = _get_ship_log_entries()
     story = _build_ship_log_story(entries)
+    with _ship_log_lock:
+        # The key comes from the snapshot, so a concurrent append still forces a rebuild.
+        _story_cache = (story, len(entries), entries[-1].id if entries else None)
     return {"story": story, "entry_count": len(entries)}